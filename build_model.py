@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import joblib
 import random
@@ -51,5 +52,8 @@ print(classification_report(y_test, y_pred))
 
 
 # Step 5: Save model
-joblib.dump(model, "ml_emergency_model_data.pkl")
+# Written to a temporary file first; the rename is atomic, so running
+# services never load a half-written model.
+joblib.dump(model, "ml_emergency_model_data.pkl.tmp")
+os.replace("ml_emergency_model_data.pkl.tmp", "ml_emergency_model_data.pkl")
 print("✅ Model saved as ml_emergency_model_data.pkl")
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Load the model before gunicorn forks (preload_app in gunicorn.conf.py),
+# so all workers share its memory instead of each loading a copy.
+from sensorapp.inference import model_store
+
+try:
+    model_store.get()
+except FileNotFoundError:
+    pass
+except Exception as e:
+    # A bad artifact must not take down the whole API; /api/predict/ answers 503 until it is rebuilt
+    logging.getLogger(__name__).error(f"Failed to preload model from {model_store.path}: {e}")
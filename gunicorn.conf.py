@@ -0,0 +1,4 @@
+# Import the app in the master process so the ML model loaded by
+# config/wsgi.py is shared copy-on-write by all workers.
+wsgi_app = "config.wsgi:application"
+preload_app = True
@@ -0,0 +1,82 @@
+from itertools import islice
+
+
+def lttb(points, n, threshold):
+    """Largest-Triangle-Three-Buckets over an iterator of (x, y) points.
+
+    `n` is the number of points the iterator yields. Points are consumed in
+    a single pass, holding only the current and the next bucket in memory,
+    and `threshold` points are yielded, always including the first and last.
+    """
+    points = iter(points)
+    if threshold >= n or threshold < 3:
+        yield from points
+        return
+
+    every = (n - 2) / (threshold - 2)
+
+    def buckets():
+        start = 1
+        for b in range(threshold - 2):
+            end = n - 1 if b == threshold - 3 else int((b + 1) * every) + 1
+            bucket = list(islice(points, end - start))
+            if not bucket:
+                return
+            yield bucket
+            start = end
+
+    a = next(points, None)
+    if a is None:
+        return
+    yield a
+
+    bucket_iter = buckets()
+    current = next(bucket_iter, None)
+    while current is not None:
+        following = next(bucket_iter, None)
+        if following is None:
+            # Last bucket: the triangle closes on the final point
+            last = next(points, None)
+            if last is None:
+                last = current.pop()
+                if not current:
+                    yield last
+                    return
+            following = [last]
+        else:
+            last = None
+
+        cx = sum(p[0] for p in following) / len(following)
+        cy = sum(p[1] for p in following) / len(following)
+        ax, ay = a
+        a = max(current, key=lambda p: abs((ax - cx) * (p[1] - ay) - (ax - p[0]) * (cy - ay)))
+        yield a
+
+        if last is not None:
+            yield last
+            return
+        current = following
+
+
+def minmax(points, start, end, buckets):
+    """Min and max point of each of `buckets` equal time slices of [start, end].
+
+    Points must be sorted by x. Keeps spikes visible at half the point
+    budget of LTTB, and needs no count of the input.
+    """
+    width = (end - start) / buckets or 1
+    current = None
+    low = high = None
+    for p in points:
+        index = min(int((p[0] - start) / width), buckets - 1)
+        if index != current:
+            if low is not None:
+                yield from sorted({low, high})
+            current, low, high = index, p, p
+            continue
+        if p[1] < low[1]:
+            low = p
+        if p[1] > high[1]:
+            high = p
+    if low is not None:
+        yield from sorted({low, high})
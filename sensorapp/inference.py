@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+
+import joblib
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.getenv("ML_MODEL_PATH", "ml_emergency_model_data.pkl")
+RELOAD_CHECK_INTERVAL = 5  # Seconds between checks of the model file mtime
+
+FEATURES = ["temperature", "humidity", "gas", "button"]
+
+
+# Valid range of each analog feature; anything else is fed to the model as 0
+FEATURE_RANGES = {
+    "temperature": (0, 100),
+    "humidity": (0, 100),
+    "gas": (0, 5000),
+}
+
+
+def frame_features(frame):
+    """Model input frame from a DataFrame of readings, sanitized column-wise"""
+    input_data = pd.DataFrame(index=frame.index, columns=FEATURES, dtype=float)
+    for field, (min_val, max_val) in FEATURE_RANGES.items():
+        values = pd.to_numeric(frame[field], errors="coerce") if field in frame else 0.0
+        input_data[field] = values
+        input_data.loc[~input_data[field].between(min_val, max_val), field] = 0.0
+    button = frame["button"] if "button" in frame else False
+    input_data["button"] = pd.Series(button, index=frame.index).fillna(False).astype(bool).astype(int)
+    return input_data
+
+
+def features(readings):
+    """Model input frame for a list of stored readings"""
+    return frame_features(pd.DataFrame.from_records(readings))
+
+
+def score_frame(model, input_data):
+    """Predicted class and emergency probability for every row of a feature frame"""
+    predictions = model.predict(input_data)
+    proba = model.predict_proba(input_data)
+    # Probability of the positive class; a model trained on one class has a single column
+    probas = proba[:, 1] if proba.shape[1] > 1 else proba[:, 0]
+    return predictions, probas
+
+
+def score(model, readings):
+    """Predicted class and emergency probability for every reading"""
+    return score_frame(model, features(readings))
+
+
+class ModelStore:
+    """Loads the model artifact once per process and reloads it when it changes.
+
+    sklearn copies the tree arrays into its own buffers on unpickling, so
+    the model cannot be memory-mapped from the file. To share one copy
+    between gunicorn workers, load it in the master before forking
+    (config/wsgi.py does this under preload_app); the workers then share
+    those pages copy-on-write. A worker that reloads a changed artifact
+    holds a private copy until the server is restarted. Replace the artifact
+    atomically (write a temporary file, then os.replace) so readers never
+    see a partial file.
+    """
+
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.model = None
+        self.mtime = None
+        self.next_check = 0
+
+    def get(self):
+        """Current model; raises FileNotFoundError if it was never built"""
+        now = time.monotonic()
+        if self.model is not None and now < self.next_check:
+            return self.model
+        with self.lock:
+            self.next_check = now + RELOAD_CHECK_INTERVAL
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                if self.model is None:
+                    raise
+                return self.model
+            if mtime != self.mtime:
+                try:
+                    self.model = joblib.load(self.path)
+                except Exception as e:
+                    if self.model is None:
+                        raise
+                    logger.error(f"Failed to reload model from {self.path}: {e}")
+                else:
+                    logger.info(f"Loaded model from {self.path}")
+                self.mtime = mtime
+        return self.model
+
+
+model_store = ModelStore()
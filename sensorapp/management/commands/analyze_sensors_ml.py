@@ -1,76 +1,63 @@
 import os
 import time
-import joblib
-import pandas as pd
 import requests
 from django.core.management.base import BaseCommand
 from datetime import datetime
 
+from sensorapp.inference import features, model_store, score_frame
+from sensorapp.online import CHECKPOINT_INTERVAL, OnlineModel
+from sensorapp.rules import RuleEngine, to_columns
+from sensorapp.scheduler import SendScheduler
+
 API_LATEST = "http://localhost:80/api/latest-sensor/"
 API_PREV = "http://localhost:80/api/prev-sensor/"
 API_SENSOR_DATA = "http://mg.thejoma.uz/api/home-devices/sensor-data"
 
 # Default configuration
 HOME_ID = os.getenv("HOME_ID", 1)
-DEVICE_ID = os.getenv("DEVICE_ID", 1)
+DEVICE_ID = os.getenv("DEVICE_ID", 1)  # Used for readings that carry no device_id
 NORMAL_INTERVAL = 10  # Send every 10 seconds
 RISK_INTERVAL = 1    # Send every 1 second if risk detected
+ANALYZE_INTERVAL = 1  # Analyze the latest reading every second
+PENDING_TTL = NORMAL_INTERVAL  # Stop sending an analysis that has not been refreshed for this long
+
+
+def api_device_id(device_id):
+    """Device id as the server API expects it: numeric ids as int"""
+    try:
+        return int(device_id)
+    except (TypeError, ValueError):
+        return device_id
 
 class Command(BaseCommand):
     help = 'Run ML-based emergency detection and send sensor data to server.'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.last_send_time = 0
+        self.scheduler = SendScheduler(NORMAL_INTERVAL, RISK_INTERVAL)
+        # Latest analysis per home/device, sent when the scheduler says it is due
+        self.pending = {}
         self.current_risk_level = "NORMAL"
-
-    def sanitize(self, value, min_val=0, max_val=10000):
-        try:
-            val = float(value)
-            if min_val <= val <= max_val:
-                return val
-        except:
-            pass
-        return 0.0
+        self.rules = RuleEngine()
 
     def determine_risk_level(self, prediction, proba, latest):
         """Determine risk level and return status"""
-        motion = any(latest.get("motion", []))
-        door = any(latest.get("cmk", []))
-        button = latest.get("button")
-
-        if button:
-            return "HIGH", "PANIC BUTTON PRESSED"
-
-        # if prediction == 1 and proba > 0.8 and (motion or door):
-        #     print(prediction)
-        #     return "HIGH", "Confirmed by context sensors"
-
-        # if prediction == 1 and proba > 0.6:
-        #     return "MEDIUM", "ML triggered without confirmation"
         print(f"Prediction: {prediction}, Probability: {proba:.2f}")
-        if (
-            latest.get("temperature", 0) > 45 or
-            latest.get("gas", 0) > 900
-        ):
-            return "LOW", "Slightly elevated sensor values"
-
-        return "NORMAL", "All conditions stable"
+        cols = to_columns([latest])
+        # Rules may also refer to the model output
+        cols["prediction"] = [prediction]
+        cols["proba"] = [proba]
+        levels, reasons = self.rules.evaluate(cols)
+        return levels[0], reasons[0]
 
     def rate_of_change_check(self, latest, prev):
         """Check for anomalous rate of change in sensor values"""
         if not prev:
             return True
 
-        temp_delta = abs((latest.get("temperature") or 0) - (prev.get("temperature") or 0))
-        gas_delta = abs((latest.get("gas") or 0) - (prev.get("gas") or 0))
-
-        if temp_delta > 20:
-            self.stdout.write(f"⚠️  Large temperature change detected: {temp_delta} °C")
-            return False
-
-        if gas_delta > 500:
-            self.stdout.write(f"⚠️  Large gas change detected: {gas_delta}")
+        noisy, reasons = self.rules.noise(to_columns([latest]), to_columns([prev]))
+        if noisy[0]:
+            self.stdout.write(f"⚠️  {reasons[0]}")
             return False
 
         return True
@@ -87,8 +74,9 @@ class Command(BaseCommand):
             self.stderr.write(f"Error connecting to {url}: {e}")
         return None
 
-    def send_sensor_data(self, latest, risk_level, risk_status):
-        """Send sensor data to server API"""
+    def send_sensor_data(self, key, latest, risk_level, risk_status):
+        """Send sensor data of the (home, device) `key` to server API"""
+        home_id, device_id = key
         try:
             # # Extract motion and door/cmk data
             # motion_status = any(latest.get("motion", []))
@@ -101,8 +89,8 @@ class Command(BaseCommand):
             cmk2 = latest.get("cmk", [True, True])[1]
             
             payload = {
-                "home_id": int(HOME_ID),
-                "device_id": int(DEVICE_ID),        
+                "home_id": int(home_id),
+                "device_id": api_device_id(device_id),
                 "sensors": {
                     "temperature": latest.get('temperature'),
                     "humidity": latest.get('humidity'),
@@ -145,13 +133,62 @@ class Command(BaseCommand):
             self.stderr.write(f"Error sending sensor data: {e}")
             return False
 
+    def pause(self, key):
+        """Stop sending the last analysis of `key` until it is analyzed again"""
+        self.scheduler.remove(key)
+        self.pending.pop(key, None)
+
+    def dispatch_due(self, now):
+        """Send the latest analysis of every home/device whose send time has come"""
+        for key in self.scheduler.pop_due(now):
+            latest, risk_level, risk_status, analyzed_at = self.pending[key]
+            if now - analyzed_at > PENDING_TTL:
+                # The device is no longer the latest reading; don't repeat its last verdict forever
+                self.stdout.write(f"⌛ No fresh analysis for {key}, stopped sending it.")
+                self.pause(key)
+                continue
+            self.send_sensor_data(key, latest, risk_level, risk_status)
+
+    def sleep_until(self, deadline):
+        """Sleep until `deadline`, waking only to dispatch sends that fall due"""
+        while True:
+            now = time.time()
+            self.dispatch_due(now)
+            if now >= deadline:
+                return
+            next_due = self.scheduler.next_due()
+            wake = deadline if next_due is None else min(deadline, next_due)
+            time.sleep(max(0, wake - now))
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--online',
+            action='store_true',
+            help='Adapt a per-home model incrementally from analyzed readings'
+        )
+
+    def learn_online(self, key, latest, input_data, current_time):
+        """Feed a rule-labeled reading to the online model and checkpoint it periodically"""
+        # The latest reading is polled every second; learn from each one only once
+        if self.last_learned.get(key) == latest.get("id"):
+            return
+        self.last_learned[key] = latest.get("id")
+        # Label with the rules on the sensor values alone: the blended score feeds the
+        # model rules, and the online model must not learn from its own output
+        levels, _ = self.rules.evaluate(to_columns([latest]))
+        if self.online.learn(key, input_data, [int(levels[0] != "NORMAL")]):
+            self.stdout.write(f"🧠 Online model updated for {key}")
+        if current_time - self.last_checkpoint >= CHECKPOINT_INTERVAL:
+            self.online.checkpoint()
+            self.last_checkpoint = current_time
+
     def handle(self, *args, **options):
         self.stdout.write(
             self.style.SUCCESS("🤖 Starting ML emergency detection service...\n")
         )
 
         try:
-            model = joblib.load("ml_emergency_model_data.pkl")
+            model_store.get()
         except FileNotFoundError:
             self.stderr.write("⚠️ Model not found. Run training script first.")
             self.stderr.write(str(os.listdir()))
@@ -159,9 +196,14 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Configuration:")
         self.stdout.write(f"  Home ID: {HOME_ID}")
-        self.stdout.write(f"  Device ID: {DEVICE_ID}")
+        self.stdout.write(f"  Default device ID: {DEVICE_ID}")
         self.stdout.write(f"  Normal send interval: {NORMAL_INTERVAL}s")
-        self.stdout.write(f"  Risk send interval: {RISK_INTERVAL}s\n")
+        self.stdout.write(f"  Risk send interval: {RISK_INTERVAL}s")
+        self.stdout.write(f"  Online learning: {'on' if options['online'] else 'off'}\n")
+
+        self.online = OnlineModel.load() if options['online'] else None
+        self.last_learned = {}
+        self.last_checkpoint = time.time()
 
         try:
             while True:
@@ -172,33 +214,30 @@ class Command(BaseCommand):
                 print(F"Latest data: {latest}")
                 if not latest:
                     self.stdout.write("⏳ No latest sensor data available.")
-                    time.sleep(NORMAL_INTERVAL)
+                    # Nothing current to report for any home/device
+                    for key in list(self.pending):
+                        self.pause(key)
+                    self.sleep_until(current_time + NORMAL_INTERVAL)
                     continue
 
+                key = (HOME_ID, latest.get("device_id") or DEVICE_ID)
+
                 # Rate of change validation
                 prev = self.fetch_data(API_PREV)
                 if not self.rate_of_change_check(latest, prev):
                     self.stdout.write("❌ Skipping analysis due to suspected noise.")
-                    time.sleep(NORMAL_INTERVAL)
+                    self.pause(key)
+                    self.sleep_until(current_time + NORMAL_INTERVAL)
                     continue
 
-                # ML prediction
-                input_data = pd.DataFrame([{
-                    "temperature": self.sanitize(latest.get("temperature"), 0, 100),
-                    "humidity": self.sanitize(latest.get("humidity"), 0, 100),
-                    "gas": self.sanitize(latest.get("gas"), 0, 5000),
-                    "button": 1 if latest.get("button") else 0,
-                }])
-
-                prediction = model.predict(input_data)[0]
-                proba_array = model.predict_proba(input_data)[0]
-                
-                # Handle probability extraction safely
-                if len(proba_array) > 1:
-                    proba = proba_array[1]  # Probability of positive class
-                else:
-                    # If only one class probability, use it directly
-                    proba = proba_array[0]
+                # ML prediction; the store picks up a rebuilt model without a restart.
+                # Once a home's online model has seen enough of both classes, it is blended in,
+                # and the blended score is what the prediction/proba rules see.
+                input_data = features([latest])
+                predictions, probas = score_frame(model_store.get(), input_data)
+                if self.online:
+                    predictions, probas = self.online.blend(key, input_data, predictions, probas)
+                prediction, proba = predictions[0], probas[0]
 
                 # Determine risk level
                 risk_level, risk_status = self.determine_risk_level(prediction, proba, latest)
@@ -219,18 +258,19 @@ class Command(BaseCommand):
                     self.style.SUCCESS(f"🧩 Risk Level: {risk_level} - {risk_status}")
                 )
 
-                # Determine send interval based on risk level
-                send_interval = RISK_INTERVAL if risk_level != "NORMAL" else NORMAL_INTERVAL
+                if self.online:
+                    self.learn_online(key, latest, input_data, current_time)
 
-                # Send data if interval has passed
-                if current_time - self.last_send_time >= send_interval:
-                    self.send_sensor_data(latest, risk_level, risk_status)
-                    self.last_send_time = current_time
+                # Send interval follows the risk level of each home/device
+                self.pending[key] = (latest, risk_level, risk_status, current_time)
+                self.scheduler.update(key, risk_level, current_time)
 
                 self.current_risk_level = risk_level
 
-                # Sleep before next analysis
-                time.sleep(1)
+                # Send whatever is due and sleep before next analysis
+                self.sleep_until(current_time + ANALYZE_INTERVAL)
 
         except KeyboardInterrupt:
+            if self.online:
+                self.online.checkpoint()
             self.stdout.write(self.style.WARNING("\n⏹️  Service stopped by user."))
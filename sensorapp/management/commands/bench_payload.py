@@ -0,0 +1,41 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from sensorapp.payload import decode, encode
+from .mqtt_simulator import MQTTSimulator
+
+
+class Command(BaseCommand):
+    help = 'Compare decode throughput and size of JSON and binary sensor payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000,
+                            help='Number of simulated readings to decode')
+
+    def bench(self, payloads):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        elapsed = time.perf_counter() - start
+        return len(payloads) / elapsed, sum(len(p) for p in payloads) / len(payloads)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        simulator = MQTTSimulator()
+        readings = [simulator.generate_sensor_data() for _ in range(count)]
+
+        json_payloads = [json.dumps(r).encode() for r in readings]
+        binary_payloads = [encode(r) for r in readings]
+
+        self.stdout.write(f"Decoding {count} readings...")
+        json_rate, json_size = self.bench(json_payloads)
+        binary_rate, binary_size = self.bench(binary_payloads)
+
+        self.stdout.write(f"  JSON:   {json_rate:,.0f} msg/s, {json_size:.0f} bytes/msg")
+        self.stdout.write(f"  Binary: {binary_rate:,.0f} msg/s, {binary_size:.0f} bytes/msg")
+        self.stdout.write(self.style.SUCCESS(
+            f"Binary is {binary_rate / json_rate:.1f}x faster to decode "
+            f"and {json_size / binary_size:.1f}x smaller"
+        ))
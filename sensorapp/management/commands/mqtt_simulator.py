@@ -8,6 +8,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 import logging
 
+from sensorapp import payload as binary_payload
+
 logger = logging.getLogger(__name__)
 
 # MQTT Configuration
@@ -32,12 +34,13 @@ class MQTTSimulator:
     """Simulate Arduino sensor data and publish to MQTT"""
     
     def __init__(self, broker=MQTT_BROKER, port=MQTT_PORT, 
-                 user=MQTT_USER, password=MQTT_PASS, topic=MQTT_TOPIC):
+                 user=MQTT_USER, password=MQTT_PASS, topic=MQTT_TOPIC, payload_format="json"):
         self.broker = broker
         self.port = port
         self.user = user
         self.password = password
         self.topic = topic
+        self.payload_format = payload_format
         self.client = mqtt.Client()
         self.is_running = False
         self.thread = None
@@ -98,7 +101,10 @@ class MQTTSimulator:
             while self.is_running:
                 try:
                     sensor_data = self.generate_sensor_data()
-                    payload = json.dumps(sensor_data)
+                    if self.payload_format == "binary":
+                        payload = binary_payload.encode(sensor_data)
+                    else:
+                        payload = json.dumps(sensor_data)
                     
                     result = self.client.publish(self.topic, payload)
                     
@@ -166,14 +172,23 @@ class Command(BaseCommand):
             default=None,
             help='Duration in seconds (None for infinite)'
         )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=['json', 'binary'],
+            default='json',
+            help='Payload format: verbose JSON or compact binary'
+        )
     
     def handle(self, *args, **options):
         broker = options['broker']
         port = options['port']
         topic = options['topic']
         duration = options['duration']
+        payload_format = options['format']
         
-        simulator = MQTTSimulator(broker=broker, port=port, topic=topic)
+        simulator = MQTTSimulator(broker=broker, port=port, topic=topic,
+                                  payload_format=payload_format)
         simulator.start()
         
         try:
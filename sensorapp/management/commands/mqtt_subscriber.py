@@ -1,25 +1,72 @@
-import json
+import os
+import signal
+import threading
 import time
-import requests
+import zlib
 
 from django.core.management.base import BaseCommand, CommandError
 import paho.mqtt.client as mqtt
 
+from sensorapp.models import SensorData
+from sensorapp.payload import decode
+from sensorapp.writer import WRITER_SOCKET, WriterClient, WriterError, WriterUnavailable
+
 # MQTT connection settings
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
-MQTT_TOPIC = "room102/data"
+# Comma separated, wildcards allowed. The first topic level names the room/device.
+MQTT_TOPICS = os.getenv("MQTT_TOPICS", "+/data")
 MQTT_USER = ""    # Update if needed
 MQTT_PASS = ""    # Update if needed
 
-# Django API endpoint to save sensor data
-API_URL = "http://localhost:80/api/save-sensor-data/"  # Adjust for production
+# Readings are buffered and written with one bulk insert per batch
+BATCH_SIZE = 100
+BATCH_INTERVAL = 1.0  # Flush at least every second
+
+
+def topic_room(topic):
+    """Room/device name encoded in the first level of the topic"""
+    return topic.split("/", 1)[0]
+
+
+def topic_worker(topic, workers):
+    """Stable worker index for a topic when partitioning by hash"""
+    return zlib.crc32(topic.encode()) % workers
+
 
 class Command(BaseCommand):
-    help = 'Subscribe to MQTT and send data to Django API'
+    help = 'Subscribe to MQTT and write sensor data to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topics', type=str, default=MQTT_TOPICS,
+                            help='Comma separated topics to subscribe to (wildcards allowed)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Total number of subscriber processes')
+        parser.add_argument('--worker-index', type=int, default=0,
+                            help='Index of this process among --workers')
+        parser.add_argument('--shared-group', type=str, default="",
+                            help='Use MQTT shared subscriptions ($share/<group>/...) '
+                                 'instead of hash partitioning')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--batch-interval', type=float, default=BATCH_INTERVAL)
 
     def handle(self, *args, **options):
-        self.stdout.write("🚀 Starting MQTT subscriber...")
+        self.topics = [t.strip() for t in options['topics'].split(",") if t.strip()]
+        self.workers = options['workers']
+        self.worker_index = options['worker_index']
+        self.shared_group = options['shared_group']
+        self.batch_size = options['batch_size']
+        self.batch_interval = options['batch_interval']
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # The writer client is not thread safe
+        # With a writer service, batches go to it instead of the database
+        self.writer = WriterClient() if WRITER_SOCKET else None
+
+        if not 0 <= self.worker_index < self.workers:
+            raise CommandError("--worker-index must be in range [0, --workers)")
+
+        self.stdout.write(f"🚀 Starting MQTT subscriber {self.worker_index + 1}/{self.workers}...")
 
         client = mqtt.Client()
 
@@ -34,35 +81,108 @@ class Command(BaseCommand):
         except Exception as e:
             raise CommandError(f"Unable to connect to MQTT broker: {e}")
 
+        # Flush the pending batch on SIGTERM as well as Ctrl+C
+        signal.signal(signal.SIGTERM, self.on_sigterm)
+
         client.loop_start()
         self.stdout.write("✅ MQTT connected. Listening for messages... (Press Ctrl+C to exit)")
 
         try:
             while True:
-                time.sleep(1)
+                time.sleep(self.batch_interval)
+                self.flush()
         except KeyboardInterrupt:
             self.stdout.write("🛑 Stopping MQTT subscriber...")
             client.loop_stop()
             client.disconnect()
+            self.flush()
+
+    def on_sigterm(self, signum, frame):
+        raise KeyboardInterrupt
+
+    def subscriptions(self):
+        """Topic filters for this worker"""
+        if self.shared_group:
+            # The broker spreads messages across all members of the group
+            return [f"$share/{self.shared_group}/{topic}" for topic in self.topics]
+        return self.topics
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self.stdout.write("✅ Connected to MQTT broker.")
-            client.subscribe(MQTT_TOPIC)
-            self.stdout.write(f"📡 Subscribed to topic: {MQTT_TOPIC}")
+            for topic in self.subscriptions():
+                client.subscribe(topic)
+                self.stdout.write(f"📡 Subscribed to topic: {topic}")
         else:
             self.stdout.write(f"❌ MQTT connection failed. Return code: {rc}")
 
     def on_message(self, client, userdata, msg):
+        # Without a shared group every worker receives every message, so drop
+        # the topics owned by other workers before paying for the decode.
+        if (not self.shared_group and self.workers > 1
+                and topic_worker(msg.topic, self.workers) != self.worker_index):
+            return
         try:
-            message = msg.payload.decode()
-            self.stdout.write(f"📥 MQTT message received: {message}")
-            data = json.loads(message)
-            print(data)
-            response = requests.post(API_URL, json=data)
-            if response.status_code == 201:
-                self.stdout.write("✅ Sensor data saved via API.")
-            else:
-                self.stdout.write(f"❌ API Error: {response.status_code} - {response.text}")
+            # JSON or compact binary, detected per message
+            data = decode(msg.payload)
+            if not isinstance(data, dict):
+                raise ValueError("Reading must be a JSON object")
+            if not data.get("device_id"):
+                data["device_id"] = topic_room(msg.topic)
+            # Reject bad readings here so they cannot fail a whole batch
+            record = SensorData.from_payload(data)
         except Exception as e:
-            self.stdout.write(f"❌ Failed to process MQTT message: {e}")
+            self.stdout.write(f"❌ Failed to process MQTT message on {msg.topic}: {e}")
+            return
+
+        with self.lock:
+            self.pending.append((data, record))
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered readings as one batch"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            if batch:
+                self.write(batch)
+
+    def write(self, batch):
+        if self.writer:
+            try:
+                self.writer.write([data for data, _ in batch])
+                self.stdout.write(f"✅ Saved {len(batch)} sensor readings.")
+                return
+            except WriterUnavailable as e:
+                # Writer down or restarting: store the batch directly rather than lose it
+                self.stdout.write(f"⚠️ {e}; writing {len(batch)} sensor readings directly.")
+            except WriterError as e:
+                # The writer reached the database and reported the failure itself
+                self.stdout.write(f"❌ Sensor writer failed to save {len(batch)} sensor readings: {e}")
+                return
+        self.write_direct([record for _, record in batch])
+
+    def write_direct(self, records):
+        """Insert records with one bulk insert, one by one if that fails"""
+        try:
+            SensorData.objects.bulk_create(records)
+            self.stdout.write(f"✅ Saved {len(records)} sensor readings.")
+        except Exception as e:
+            self.stdout.write(f"❌ Failed to save {len(records)} sensor readings as a batch: {e}")
+            self.write_each(records)
+
+    def write_each(self, records):
+        """Save records one by one so a bad reading only loses itself"""
+        saved = 0
+        for record in records:
+            # bulk_create may have assigned keys before it failed
+            record.pk = None
+            record._state.adding = True
+            try:
+                record.save()
+                saved += 1
+            except Exception as e:
+                self.stdout.write(f"❌ Failed to save reading from {record.device_id}: {e}")
+        self.stdout.write(f"✅ Saved {saved}/{len(records)} sensor readings one by one.")
@@ -0,0 +1,88 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from .mqtt_subscriber import MQTT_TOPICS
+
+RESTART_DELAY = 1     # Seconds before restarting a worker that exited
+MAX_RESTART_DELAY = 30
+
+
+class Command(BaseCommand):
+    help = 'Start N MQTT subscriber processes and restart them when they exit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of subscriber processes (default: CPU count)')
+        parser.add_argument('--topics', type=str, default=MQTT_TOPICS,
+                            help='Comma separated topics to subscribe to')
+        parser.add_argument('--shared-group', type=str, default="",
+                            help='MQTT shared subscription group; hash partitioning if empty')
+
+    def worker_command(self, index, options):
+        return [
+            sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "mqtt_subscriber",
+            "--topics", options['topics'],
+            "--workers", str(options['workers']),
+            "--worker-index", str(index),
+            "--shared-group", options['shared_group'],
+        ]
+
+    def on_sigterm(self, signum, frame):
+        raise KeyboardInterrupt
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stdout.write(f"🚀 Starting {workers} MQTT subscriber workers...")
+
+        # systemd, docker and supervisord stop with SIGTERM; clean up the same as Ctrl+C
+        # so no orphaned worker keeps inserting next to its replacement
+        signal.signal(signal.SIGTERM, self.on_sigterm)
+
+        procs = {}
+        delays = {}
+        restart_at = {}
+        try:
+            for index in range(workers):
+                procs[index] = subprocess.Popen(self.worker_command(index, options))
+                delays[index] = RESTART_DELAY
+
+            while True:
+                now = time.monotonic()
+                for index, proc in procs.items():
+                    if proc is None:
+                        if now >= restart_at[index]:
+                            self.stdout.write(f"🔄 Restarting worker {index}")
+                            procs[index] = subprocess.Popen(self.worker_command(index, options))
+                        continue
+                    rc = proc.poll()
+                    if rc is None:
+                        continue
+                    # Back off when a worker keeps crashing, e.g. broker unreachable
+                    uptime_ok = now - restart_at.get(index, 0) > MAX_RESTART_DELAY
+                    delays[index] = RESTART_DELAY if uptime_ok else min(delays[index] * 2, MAX_RESTART_DELAY)
+                    restart_at[index] = now + delays[index]
+                    procs[index] = None
+                    self.stdout.write(
+                        f"❌ Worker {index} exited with code {rc}, restarting in {delays[index]}s"
+                    )
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("🛑 Stopping MQTT subscriber workers...")
+        finally:
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            for proc in procs.values():
+                if proc is not None and proc.poll() is None:
+                    # SIGINT lets the worker flush its pending batch
+                    proc.send_signal(signal.SIGINT)
+            for proc in procs.values():
+                if proc is not None:
+                    try:
+                        proc.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
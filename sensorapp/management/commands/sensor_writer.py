@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sensorapp.writer import MAX_BATCH, WRITER_SOCKET, SensorWriter, WriterServer
+
+
+class Command(BaseCommand):
+    help = 'Run the single database writer that group-commits readings from all producers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', type=str, default=WRITER_SOCKET,
+                            help='Unix socket to listen on (default: $SENSOR_WRITER_SOCKET)')
+        parser.add_argument('--max-batch', type=int, default=MAX_BATCH,
+                            help='Most readings committed in one transaction')
+
+    def handle(self, *args, **options):
+        path = options['socket']
+        if not path:
+            raise CommandError("Set SENSOR_WRITER_SOCKET or pass --socket.")
+
+        writer = SensorWriter(max_batch=options['max_batch'])
+        writer.start()
+        server = WriterServer(path, writer)
+        self.stdout.write(f"✅ Sensor writer listening on {path} (Press Ctrl+C to exit)")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("🛑 Stopping sensor writer...")
+        finally:
+            server.server_close()
+            writer.stop()
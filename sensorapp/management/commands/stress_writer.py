@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sensorapp.models import SensorData
+from sensorapp.writer import WRITER_SOCKET, WriterClient
+from .mqtt_simulator import MQTTSimulator
+
+
+class Command(BaseCommand):
+    help = 'Write from many concurrent producers and report write latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--producers', type=int, default=50,
+                            help='Number of concurrent producer threads')
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Readings written by each producer')
+        parser.add_argument('--socket', type=str, default=WRITER_SOCKET,
+                            help='Writer socket (default: $SENSOR_WRITER_SOCKET)')
+        parser.add_argument('--direct', action='store_true',
+                            help='Save through the ORM from every producer instead, for comparison')
+
+    def produce(self, options, latencies, errors):
+        simulator = MQTTSimulator()
+        client = None if options['direct'] else WriterClient(options['socket'])
+        for _ in range(options['writes']):
+            data = simulator.generate_sensor_data()
+            start = time.perf_counter()
+            try:
+                if client:
+                    client.write(data)
+                else:
+                    SensorData.from_payload(data).save()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+            # Jitter so producers do not run in lockstep
+            time.sleep(random.uniform(0, 0.01))
+        if client:
+            client.close()
+
+    def handle(self, *args, **options):
+        if not options['direct'] and not options['socket']:
+            raise CommandError("Set SENSOR_WRITER_SOCKET, pass --socket, or use --direct.")
+
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(target=self.produce, args=(options, latencies, errors))
+            for _ in range(options['producers'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        mode = "direct ORM" if options['direct'] else "writer service"
+        self.stdout.write(f"{options['producers']} producers x {options['writes']} writes via {mode}")
+        self.stdout.write(f"  Written: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:,.0f}/s)")
+        if errors:
+            self.stdout.write(self.style.WARNING(f"  Errors: {len(errors)} (first: {errors[0]})"))
+        if not latencies:
+            return
+        latencies.sort()
+        for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+            self.stdout.write(f"  {label}: {value * 1000:.1f} ms")
+        self.stdout.write(f"  max: {latencies[-1] * 1000:.1f} ms")
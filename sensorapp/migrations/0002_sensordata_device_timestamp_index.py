@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensorapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['device_id', 'timestamp'], name='sensorapp_s_device__3a51ad_idx'),
+        ),
+    ]
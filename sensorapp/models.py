@@ -1,5 +1,18 @@
 from django.db import models
 
+# String forms of a boolean, as sent by form-encoded posts
+BOOL_STRINGS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _as_bool(value, field):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in BOOL_STRINGS:
+        return BOOL_STRINGS[value.strip().lower()]
+    raise ValueError(f"{field} must be a boolean, got {value!r}")
+
 class SensorData(models.Model):
     device_id   = models.CharField(max_length=20)
     controller  = models.CharField(max_length=50)
@@ -13,5 +26,40 @@ class SensorData(models.Model):
     gas         = models.FloatField(null=True, blank=True)
     timestamp   = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-device time range scans (series endpoint, backtests)
+            models.Index(fields=["device_id", "timestamp"]),
+        ]
+
     def __str__(self):
         return f"Data from device {self.device_id} at {self.timestamp}"
+
+    @classmethod
+    def from_payload(cls, data, device_id=""):
+        """Build an unsaved record from a controller payload.
+
+        Raises ValueError for payloads the table cannot store, so callers can
+        reject a single bad reading before it reaches a batch insert.
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Reading must be a JSON object")
+        controller = data.get("controller", "")
+        if controller is None:
+            raise ValueError("controller must not be null")
+        values = {}
+        for field in ("temperature", "humidity", "gas"):
+            value = data.get(field)
+            try:
+                values[field] = None if value is None else float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be a number, got {value!r}")
+        return cls(
+            device_id=data.get("device_id") or device_id,
+            controller=controller,
+            cmk=data.get("cmk", []),
+            motion=data.get("motion", []),
+            # The controller reports the button pin level, which is low while pressed
+            button=not _as_bool(data.get("button", False), "button"),
+            **values,
+        )
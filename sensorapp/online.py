@@ -0,0 +1,92 @@
+import logging
+import os
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+from .inference import FEATURE_RANGES, FEATURES
+
+logger = logging.getLogger(__name__)
+
+ONLINE_MODEL_PATH = os.getenv("ML_ONLINE_MODEL_PATH", "ml_online_model.pkl")
+BATCH_SIZE = 32            # Readings per partial_fit call
+CHECKPOINT_INTERVAL = 300  # Seconds between checkpoints to disk
+# A home's model is only consulted once it has seen this much data
+MIN_SAMPLES = 500
+MIN_PER_CLASS = 20
+
+CLASSES = np.array([0, 1])
+# Feature scale for SGD; button is already 0/1
+SCALE = np.array([FEATURE_RANGES.get(f, (0, 1))[1] for f in FEATURES], dtype=float)
+
+
+class OnlineModel:
+    """Per-home logistic regression updated incrementally with partial_fit.
+
+    Readings are buffered per key and fitted in mini-batches of BATCH_SIZE,
+    so each reading costs the same no matter how long the model has run.
+    The labels come from the alert rules evaluated on the sensor values
+    alone, so this is self-training: the model adapts the rules' verdicts
+    to each home's sensor distribution, it does not learn from confirmed
+    incidents. It therefore never replaces the offline forest; blend()
+    averages the two, and only once the home has MIN_SAMPLES readings with
+    at least MIN_PER_CLASS of each class. Before that the forest alone is
+    used. The blended probability is what the risk rules on prediction and
+    proba (e.g. the default "ML triggered" rule) evaluate.
+    """
+
+    def __init__(self, models=None, counts=None):
+        self.models = models or {}
+        self.counts = counts or {}  # key -> [negatives, positives] learned
+        self.buffers = {}
+
+    @classmethod
+    def load(cls, path=ONLINE_MODEL_PATH):
+        """Model from the last checkpoint, or an empty one"""
+        try:
+            state = joblib.load(path)
+        except FileNotFoundError:
+            return cls()
+        return cls(state["models"], state["counts"])
+
+    def checkpoint(self, path=ONLINE_MODEL_PATH):
+        """Write all per-home models to disk, atomically replacing the previous checkpoint"""
+        tmp = f"{path}.tmp"
+        joblib.dump({"models": self.models, "counts": self.counts}, tmp)
+        os.replace(tmp, path)
+        logger.info(f"Checkpointed {len(self.models)} online models to {path}")
+
+    def learn(self, key, input_data, labels):
+        """Buffer labeled feature rows for `key`; fits when a mini-batch is full"""
+        buffer = self.buffers.setdefault(key, ([], []))
+        buffer[0].append(input_data.to_numpy(dtype=float) / SCALE)
+        buffer[1].extend(labels)
+        if len(buffer[1]) < BATCH_SIZE:
+            return False
+        X = np.vstack(buffer[0])
+        y = np.asarray(buffer[1])
+        self.buffers[key] = ([], [])
+
+        model = self.models.get(key)
+        if model is None:
+            model = self.models[key] = SGDClassifier(loss="log_loss", random_state=42)
+        model.partial_fit(X, y, classes=CLASSES)
+        counts = self.counts.setdefault(key, [0, 0])
+        counts[0] += int((y == 0).sum())
+        counts[1] += int((y == 1).sum())
+        return True
+
+    def ready(self, key):
+        """Whether the model of `key` has seen enough of both classes to be trusted"""
+        negatives, positives = self.counts.get(key, (0, 0))
+        return (key in self.models and negatives + positives >= MIN_SAMPLES
+                and min(negatives, positives) >= MIN_PER_CLASS)
+
+    def blend(self, key, input_data, predictions, probas):
+        """Average the forest's probabilities with the home's model once it is ready"""
+        if not self.ready(key):
+            return predictions, probas
+        X = input_data.to_numpy(dtype=float) / SCALE
+        probas = (probas + self.models[key].predict_proba(X)[:, 1]) / 2
+        return (probas > 0.5).astype(int), probas
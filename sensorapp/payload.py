@@ -0,0 +1,111 @@
+import json
+import math
+import struct
+from datetime import datetime
+
+# Binary readings start with this byte; JSON payloads start with "{" or whitespace
+MAGIC = 0xA5
+
+# Version 1, little endian, 43 bytes:
+#   magic u8, version u8, device_id 20s (as wide as SensorData.device_id), controller 8s,
+#   temperature i16 (0.01 °C), humidity u16 (0.01 %), gas i32 (0.01 ppm),
+#   flags u8, timestamp u32 (unix seconds, 0 = unset)
+# Fixed point keeps the NodeMCU side free of float formatting and decodes
+# to the same two-decimal values JSON carried. A missing reading is sent
+# as the sentinel of its field; out-of-range values are clamped.
+V1 = struct.Struct("<BB20s8shHiBI")
+DEVICE_ID_LENGTH = 20
+CONTROLLER_LENGTH = 8
+MISSING_TEMPERATURE = -0x8000
+MISSING_HUMIDITY = 0xFFFF
+MISSING_GAS = -0x80000000
+# Encodable (min, max) in hundredths, excluding the sentinels
+TEMPERATURE_RANGE = (-0x7FFF, 0x7FFF)
+HUMIDITY_RANGE = (0, 0xFFFE)
+GAS_RANGE = (-0x7FFFFFFF, 0x7FFFFFFF)
+
+# Bits of the flags byte
+CMK1, CMK2, MOTION1, MOTION2, BUTTON = (1 << i for i in range(5))
+
+
+def _decode_v1(buf):
+    if len(buf) < V1.size:
+        raise ValueError(f"Truncated binary payload: {len(buf)} of {V1.size} bytes")
+    (_, _, device_id, controller, temperature, humidity, gas,
+     flags, timestamp) = V1.unpack_from(buf)
+    return {
+        "device_id": device_id.rstrip(b"\0").decode("ascii"),
+        "controller": controller.rstrip(b"\0").decode("ascii"),
+        "temperature": None if temperature == MISSING_TEMPERATURE else temperature / 100,
+        "humidity": None if humidity == MISSING_HUMIDITY else humidity / 100,
+        "cmk": [flags & CMK1 != 0, flags & CMK2 != 0],
+        "motion": [flags & MOTION1 != 0, flags & MOTION2 != 0],
+        "button": flags & BUTTON != 0,
+        "gas": None if gas == MISSING_GAS else gas / 100,
+        # Unix seconds rather than the ISO string JSON carries; the server stamps readings itself
+        "timestamp": timestamp or None,
+    }
+
+
+DECODERS = {
+    1: _decode_v1,
+}
+
+
+def _fixed(data, field, missing, value_range):
+    value = data.get(field)
+    if value is None:
+        return missing
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    if math.isnan(value):
+        return missing
+    low, high = value_range
+    return round(min(max(value * 100, low), high))
+
+
+def _text(data, field, length):
+    value = str(data.get(field) or "").encode("ascii")
+    if len(value) > length:
+        raise ValueError(f"{field} {value.decode()!r} is longer than {length} characters")
+    return value
+
+
+def encode(data):
+    """Pack a reading dict into the version 1 binary layout.
+
+    Raises ValueError if device_id or controller does not fit its field,
+    or if an analog value is not a number.
+    """
+    cmk = data.get("cmk") or [False, False]
+    motion = data.get("motion") or [False, False]
+    flags = (
+        (CMK1 if cmk[0] else 0) | (CMK2 if cmk[1:] and cmk[1] else 0)
+        | (MOTION1 if motion[0] else 0) | (MOTION2 if motion[1:] and motion[1] else 0)
+        | (BUTTON if data.get("button") else 0)
+    )
+    timestamp = data.get("timestamp")
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp).timestamp()
+    return V1.pack(
+        MAGIC, 1,
+        _text(data, "device_id", DEVICE_ID_LENGTH),
+        _text(data, "controller", CONTROLLER_LENGTH),
+        _fixed(data, "temperature", MISSING_TEMPERATURE, TEMPERATURE_RANGE),
+        _fixed(data, "humidity", MISSING_HUMIDITY, HUMIDITY_RANGE),
+        _fixed(data, "gas", MISSING_GAS, GAS_RANGE),
+        flags,
+        int(timestamp or 0),
+    )
+
+
+def decode(payload):
+    """Decode a JSON or binary reading, detected from the first byte"""
+    buf = memoryview(payload)
+    if buf and buf[0] == MAGIC:
+        if len(buf) < 2 or buf[1] not in DECODERS:
+            raise ValueError(f"Unsupported binary payload version: {buf[1] if len(buf) > 1 else None}")
+        return DECODERS[buf[1]](buf)
+    return json.loads(bytes(payload))
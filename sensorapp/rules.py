@@ -0,0 +1,270 @@
+import json
+import logging
+import operator
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RULES_PATH = os.getenv("ALERT_RULES_PATH", "alert_rules.json")
+RELOAD_CHECK_INTERVAL = 2  # Seconds between checks of the rules file mtime
+
+# Risk levels from least to most severe
+LEVELS = ["NORMAL", "LOW", "MEDIUM", "HIGH"]
+NORMAL_STATUS = "All conditions stable"
+
+# Used when the rules file does not exist; same thresholds the analyzer always had
+DEFAULT_RULES = {
+    "noise": [
+        {"reason": "Large temperature change detected",
+         "when": {"delta": "temperature", "op": ">", "value": 20}},
+        {"reason": "Large gas change detected",
+         "when": {"delta": "gas", "op": ">", "value": 500}},
+    ],
+    "risk": [
+        {"level": "HIGH", "reason": "PANIC BUTTON PRESSED",
+         "when": {"field": "button", "op": "==", "value": 1}},
+        {"level": "MEDIUM", "reason": "ML triggered without confirmation",
+         "when": {"all": [
+             {"field": "prediction", "op": "==", "value": 1},
+             {"field": "proba", "op": ">", "value": 0.6},
+         ]}},
+        {"level": "LOW", "reason": "Slightly elevated sensor values",
+         "when": {"any": [
+             {"field": "temperature", "op": ">", "value": 45},
+             {"field": "gas", "op": ">", "value": 900},
+         ]}},
+    ],
+}
+
+OPS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+NUMERIC_FIELDS = ("temperature", "humidity", "gas")
+FLAG_FIELDS = ("button", "motion", "cmk")
+READING_FIELDS = NUMERIC_FIELDS + FLAG_FIELDS
+# Model output, available to risk rules only
+MODEL_FIELDS = ("prediction", "proba")
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def to_columns(readings):
+    """Turn a list of reading dicts into a dict of NumPy columns.
+
+    Missing or non-numeric values become NaN (never match a threshold),
+    list sensors such as motion/cmk collapse to 1 when any channel is set.
+    """
+    columns = {}
+    for field in NUMERIC_FIELDS:
+        columns[field] = np.array([_as_float(r.get(field) if r else None) for r in readings], dtype=float)
+    for field in FLAG_FIELDS:
+        columns[field] = np.array(
+            [1.0 if r and any(np.atleast_1d(r.get(field) or False)) else 0.0 for r in readings]
+        )
+    return columns
+
+
+def frame_columns(frame):
+    """Same columns as to_columns() from a pandas DataFrame of readings"""
+    columns = {}
+    for field in NUMERIC_FIELDS:
+        columns[field] = frame[field].to_numpy(dtype=float, na_value=np.nan)
+    for field in FLAG_FIELDS:
+        values = frame[field]
+        if values.dtype == object:
+            values = values.map(lambda v: any(np.atleast_1d(v or False)))
+        columns[field] = values.fillna(0).to_numpy(dtype=float)
+    return columns
+
+
+def _compile(cond, fields):
+    """Compile a condition into a function of the column dict returning a bool array.
+
+    Raises ValueError for fields outside `fields` and for unknown or
+    conflicting keys, so a rules file with a typo is rejected on load
+    instead of silently matching nothing.
+    """
+    if not isinstance(cond, dict):
+        raise ValueError(f"Condition must be an object, got {cond!r}")
+    for key in ("all", "any", "not"):
+        if key in cond and len(cond) > 1:
+            raise ValueError(f"'{key}' cannot be combined with {sorted(set(cond) - {key})}")
+    for key in ("all", "any"):
+        if key in cond:
+            if not isinstance(cond[key], list) or not cond[key]:
+                raise ValueError(f"'{key}' must be a non-empty list of conditions")
+            parts = [_compile(c, fields) for c in cond[key]]
+            reduce = np.logical_and.reduce if key == "all" else np.logical_or.reduce
+            return lambda cols, prev, parts=parts, reduce=reduce: reduce([p(cols, prev) for p in parts])
+    if "not" in cond:
+        part = _compile(cond["not"], fields)
+        return lambda cols, prev: ~part(cols, prev)
+
+    kinds = [key for key in ("field", "delta") if key in cond]
+    if len(kinds) != 1:
+        raise ValueError(f"Condition needs exactly one of field, delta, all, any or not: {cond!r}")
+    unknown = set(cond) - {kinds[0], "op", "value"}
+    if unknown:
+        raise ValueError(f"Unknown condition keys: {sorted(unknown)}")
+    if cond.get("op", ">") not in OPS:
+        raise ValueError(f"Unknown operator: {cond['op']!r}")
+    if "value" not in cond:
+        raise ValueError(f"Condition has no value: {cond!r}")
+    op = OPS[cond.get("op", ">")]
+    value = _as_float(cond["value"])
+    if np.isnan(value):
+        raise ValueError(f"Condition value must be a number: {cond!r}")
+
+    if "delta" in cond:
+        field = cond["delta"]
+        # Only readings have a previous value to compare against
+        if field not in READING_FIELDS:
+            raise ValueError(f"Unknown delta field: {field!r}")
+
+        def delta(cols, prev):
+            current = np.asarray(cols[field], dtype=float)
+            if prev is None:
+                return np.zeros(len(current), dtype=bool)
+            change = np.abs(np.nan_to_num(current) - np.nan_to_num(np.asarray(prev[field], dtype=float)))
+            return op(change, value)
+        return delta
+
+    field = cond["field"]
+    if field not in fields:
+        raise ValueError(f"Unknown field: {field!r}")
+
+    def threshold(cols, prev):
+        with np.errstate(invalid="ignore"):
+            return op(np.asarray(cols[field], dtype=float), value)
+    return threshold
+
+
+def _rules(config, section, keys, required=False):
+    """Rule objects of one section, each with exactly `keys`"""
+    rules = config.get(section, [])
+    if not isinstance(rules, list) or (required and not rules):
+        raise ValueError(f"'{section}' must be a {'non-empty ' if required else ''}list of rules")
+    for rule in rules:
+        if not isinstance(rule, dict) or set(rule) != keys:
+            raise ValueError(f"Each {section} rule needs exactly the keys {sorted(keys)}: {rule!r}")
+    return rules
+
+
+class RuleSet:
+    """Compiled noise and risk rules.
+
+    The whole file is validated, so a broken edit is rejected on reload
+    rather than replacing the active rules with fewer, or none.
+    """
+
+    def __init__(self, config):
+        if not isinstance(config, dict):
+            raise ValueError("Rules must be a JSON object")
+        unknown = set(config) - {"noise", "risk"}
+        if unknown:
+            raise ValueError(f"Unknown rules sections: {sorted(unknown)}")
+        # noise() is evaluated before inference, so only risk rules may use the model output
+        self.noise = [
+            (r["reason"], _compile(r["when"], READING_FIELDS))
+            for r in _rules(config, "noise", {"reason", "when"})
+        ]
+        # Without risk rules every reading would evaluate NORMAL, even a pressed panic button
+        self.risk = [
+            (r["level"], r["reason"], _compile(r["when"], READING_FIELDS + MODEL_FIELDS))
+            for r in _rules(config, "risk", {"level", "reason", "when"}, required=True)
+        ]
+        for level, _, _ in self.risk:
+            if level not in LEVELS:
+                raise ValueError(f"Unknown risk level: {level}")
+
+
+class RuleEngine:
+    """Evaluates alert rules from a JSON file over batches of readings.
+
+    The file is re-read when its mtime changes, so thresholds can be tuned
+    without restarting the analyzer. A file that fails to load is logged and
+    the previous rules stay active.
+    """
+
+    def __init__(self, path=RULES_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.next_check = 0
+        self.rules = RuleSet(DEFAULT_RULES)
+        self.maybe_reload(force=True)
+
+    def maybe_reload(self, force=False):
+        """Reload the rules file if it changed. Returns True when rules were replaced."""
+        now = time.monotonic()
+        if not force and now < self.next_check:
+            return False
+        self.next_check = now + RELOAD_CHECK_INTERVAL
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        with self.lock:
+            try:
+                with open(self.path) as f:
+                    rules = RuleSet(json.load(f))
+            except Exception as e:
+                logger.error(f"Failed to load alert rules from {self.path}: {e}")
+                self.mtime = mtime
+                return False
+            self.rules = rules
+            self.mtime = mtime
+        logger.info(f"Loaded alert rules from {self.path}")
+        return True
+
+    def noise(self, cols, prev=None):
+        """Rows whose change since `prev` looks like sensor noise.
+
+        Returns (mask, reasons) where reasons is "" for clean rows.
+        """
+        self.maybe_reload()
+        rules = self.rules
+        n = len(cols["temperature"])
+        mask = np.zeros(n, dtype=bool)
+        reasons = np.full(n, "", dtype=object)
+        # Walk in reverse so the first matching rule wins
+        for reason, predicate in reversed(rules.noise):
+            hit = predicate(cols, prev)
+            mask |= hit
+            reasons[hit] = reason
+        return mask, reasons
+
+    def evaluate(self, cols, prev=None):
+        """Risk level and reason for every row; first matching rule wins.
+
+        Model fields missing from `cols` are NaN and never match, so the
+        rules can also be evaluated on the sensor values alone.
+        """
+        self.maybe_reload()
+        rules = self.rules
+        n = len(cols["temperature"])
+        cols = {**{field: np.full(n, np.nan) for field in MODEL_FIELDS}, **cols}
+        levels = np.full(n, "NORMAL", dtype=object)
+        reasons = np.full(n, NORMAL_STATUS, dtype=object)
+        for level, reason, predicate in reversed(rules.risk):
+            hit = predicate(cols, prev)
+            levels[hit] = level
+            reasons[hit] = reason
+        return levels, reasons
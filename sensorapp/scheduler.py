@@ -0,0 +1,75 @@
+import heapq
+import math
+
+
+class SendScheduler:
+    """Tracks when each home/device is next due to send, in a min-heap.
+
+    Each key is sent every `normal_interval` seconds while NORMAL and every
+    `risk_interval` seconds at any other risk level. Due times are rounded up
+    to the next tick so sends that fall in the same tick are returned
+    together by pop_due(). Rescheduled keys leave stale heap entries behind;
+    they are recognised by their version number and skipped.
+    """
+
+    def __init__(self, normal_interval, risk_interval, tick=1.0):
+        self.normal_interval = normal_interval
+        self.risk_interval = risk_interval
+        self.tick = tick
+        self.heap = []      # (due, version, key)
+        self.entries = {}   # key -> [due, version, risk_level, last_sent]
+
+    def interval(self, risk_level):
+        return self.risk_interval if risk_level != "NORMAL" else self.normal_interval
+
+    def _align(self, t):
+        return math.ceil(t / self.tick) * self.tick
+
+    def _push(self, key, due):
+        entry = self.entries[key]
+        entry[0] = due
+        entry[1] += 1
+        heapq.heappush(self.heap, (due, entry[1], key))
+
+    def update(self, key, risk_level, now):
+        """Record the current risk level of `key`, rescheduling it if the interval changed"""
+        entry = self.entries.get(key)
+        if entry is None:
+            # Never sent before: due straight away
+            self.entries[key] = [None, 0, risk_level, None]
+            self._push(key, self._align(now))
+            return
+        if entry[2] == risk_level:
+            return
+        entry[2] = risk_level
+        last_sent = entry[3] if entry[3] is not None else now
+        self._push(key, self._align(max(now, last_sent + self.interval(risk_level))))
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+
+    def pop_due(self, now):
+        """Keys due at or before `now`; each is rescheduled one interval ahead"""
+        due_keys = []
+        while self.heap and self.heap[0][0] <= now:
+            due, version, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is None or entry[1] != version:
+                continue  # Stale entry
+            due_keys.append(key)
+            entry[3] = now
+            self._push(key, self._align(now + self.interval(entry[2])))
+        return due_keys
+
+    def next_due(self):
+        """Earliest due time, or None if nothing is scheduled"""
+        while self.heap:
+            due, version, key = self.heap[0]
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] == version:
+                return due
+            heapq.heappop(self.heap)
+        return None
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,3 +1,301 @@
-from django.test import TestCase
+import json
+import math
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from .downsample import lttb, minmax
+from .management.commands import analyze_sensors_ml
+from .payload import MAGIC, MISSING_GAS, V1, decode, encode
+from .rules import DEFAULT_RULES, RuleEngine, RuleSet, to_columns
+from .scheduler import SendScheduler
+
+
+class PayloadTests(SimpleTestCase):
+    reading = {
+        "device_id": "kitchen-node-01",
+        "controller": "esp8266",
+        "temperature": 23.45,
+        "humidity": 51.2,
+        "gas": 412.07,
+        "cmk": [True, False],
+        "motion": [False, True],
+        "button": True,
+        "timestamp": 1700000000,
+    }
+
+    def test_round_trip(self):
+        buf = encode(self.reading)
+        self.assertEqual(len(buf), V1.size)
+        self.assertEqual(buf[0], MAGIC)
+        self.assertEqual(decode(buf), self.reading)
+
+    def test_missing_values_round_trip_as_none(self):
+        decoded = decode(encode({"device_id": "d", "humidity": math.nan}))
+        self.assertIsNone(decoded["temperature"])
+        self.assertIsNone(decoded["humidity"])
+        self.assertIsNone(decoded["gas"])
+        self.assertIsNone(decoded["timestamp"])
+
+    def test_numeric_strings_are_coerced(self):
+        self.assertEqual(decode(encode({"temperature": "25.5"}))["temperature"], 25.5)
+
+    def test_non_numeric_value_raises(self):
+        with self.assertRaises(ValueError):
+            encode({"gas": "high"})
+
+    def test_out_of_range_values_are_clamped(self):
+        decoded = decode(encode({"temperature": 1e6, "humidity": -5, "gas": -1e12}))
+        self.assertEqual(decoded["temperature"], 327.67)
+        self.assertEqual(decoded["humidity"], 0)
+        # Clamped to the range, never onto the sentinel
+        self.assertNotEqual(decoded["gas"] * 100, MISSING_GAS)
+        self.assertEqual(decoded["gas"], -21474836.47)
+
+    def test_long_ids_raise(self):
+        with self.assertRaises(ValueError):
+            encode({"device_id": "x" * 21})
+        with self.assertRaises(ValueError):
+            encode({"controller": "controller"})
+
+    def test_json_payload(self):
+        self.assertEqual(decode(b'{"device_id": "d", "gas": 1}'), {"device_id": "d", "gas": 1})
+
+    def test_truncated_buffer_raises(self):
+        with self.assertRaises(ValueError):
+            decode(encode(self.reading)[:-1])
+
+    def test_unknown_version_raises(self):
+        buf = bytearray(encode(self.reading))
+        buf[1] = 99
+        with self.assertRaises(ValueError):
+            decode(bytes(buf))
+        with self.assertRaises(ValueError):
+            decode(bytes([MAGIC]))
+
+
+class DownsampleTests(SimpleTestCase):
+    points = [(x, math.sin(x / 10) * 100) for x in range(1000)]
+
+    def test_lttb_keeps_endpoints_and_count(self):
+        result = list(lttb(self.points, len(self.points), 100))
+        self.assertEqual(len(result), 100)
+        self.assertEqual(result[0], self.points[0])
+        self.assertEqual(result[-1], self.points[-1])
+        self.assertEqual(result, sorted(result))
+
+    def test_lttb_keeps_spike(self):
+        points = [(x, 0.0) for x in range(500)]
+        points[250] = (250, 1000.0)
+        self.assertIn((250, 1000.0), list(lttb(points, len(points), 20)))
+
+    def test_lttb_passes_small_input_through(self):
+        self.assertEqual(list(lttb(self.points[:10], 10, 20)), self.points[:10])
+        self.assertEqual(list(lttb(self.points[:10], 10, 2)), self.points[:10])
+        self.assertEqual(list(lttb([], 0, 10)), [])
+
+    def test_lttb_with_short_iterator(self):
+        # The count may be stale when rows arrive while the query runs
+        result = list(lttb(iter(self.points[:50]), 100, 10))
+        self.assertEqual(result[0], self.points[0])
+        self.assertEqual(result[-1], self.points[49])
+
+    def test_minmax_keeps_extremes_of_each_bucket(self):
+        result = list(minmax(self.points, 0, 999, 10))
+        self.assertLessEqual(len(result), 20)
+        self.assertEqual(result, sorted(result))
+        self.assertIn(max(self.points, key=lambda p: p[1]), result)
+        self.assertIn(min(self.points, key=lambda p: p[1]), result)
+
+    def test_minmax_single_point_bucket(self):
+        self.assertEqual(list(minmax([(5, 1.0)], 5, 5, 10)), [(5, 1.0)])
+        self.assertEqual(list(minmax([], 0, 10, 10)), [])
+
+
+def risk_rule(when, level="HIGH", reason="test"):
+    return {"level": level, "reason": reason, "when": when}
+
+
+class RuleSetTests(SimpleTestCase):
+    def test_default_rules_compile(self):
+        rules = RuleSet(DEFAULT_RULES)
+        self.assertEqual(len(rules.noise), 2)
+        self.assertEqual(len(rules.risk), len(DEFAULT_RULES["risk"]))
+
+    def test_compiles_nested_conditions(self):
+        rules = RuleSet({"risk": [risk_rule({"all": [
+            {"field": "gas", "op": ">", "value": 100},
+            {"not": {"field": "temperature", "op": "<", "value": 10}},
+        ]})]})
+        cols = to_columns([{"gas": 200, "temperature": 20}, {"gas": 200, "temperature": 5},
+                           {"gas": 50, "temperature": 20}])
+        np.testing.assert_array_equal(rules.risk[0][2](cols, None), [True, False, False])
+
+    def test_rejects_unknown_or_missing_sections(self):
+        for config in ({"riskk": [risk_rule({"field": "gas", "value": 1})]},
+                       {"risk": [risk_rule({"field": "gas", "value": 1})], "extra": []},
+                       {"noise": []}, {"risk": []}, {"risk": {}}, []):
+            with self.subTest(config=config), self.assertRaises(ValueError):
+                RuleSet(config)
+
+    def test_rejects_bad_conditions(self):
+        for when in ({"unknownkey": 1, "field": "gas", "op": ">", "value": 1},
+                     {"field": "gas", "value": 1, "any": [{"field": "gas", "value": 1}]},
+                     {"field": "gas", "delta": "gas", "value": 1},
+                     {"field": "gass", "value": 1},
+                     {"field": "gas", "op": "=>", "value": 1},
+                     {"field": "gas", "value": "high"},
+                     {"field": "gas"},
+                     {"any": []},
+                     {"delta": "proba", "value": 1},
+                     {}):
+            with self.subTest(when=when), self.assertRaises(ValueError):
+                RuleSet({"risk": [risk_rule(when)]})
+
+    def test_rejects_bad_rules(self):
+        for rule in (risk_rule({"field": "gas", "value": 1}, level="CRITICAL"),
+                     {"level": "HIGH", "when": {"field": "gas", "value": 1}},
+                     {**risk_rule({"field": "gas", "value": 1}), "severity": 2}):
+            with self.subTest(rule=rule), self.assertRaises(ValueError):
+                RuleSet({"risk": [rule]})
+
+    def test_noise_rules_cannot_use_model_output(self):
+        with self.assertRaises(ValueError):
+            RuleSet({"noise": [{"reason": "x", "when": {"field": "proba", "value": 0.5}}],
+                     "risk": [risk_rule({"field": "proba", "value": 0.5})]})
+
+
+class RuleEngineTests(SimpleTestCase):
+    def engine(self, config):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(config, f)
+        self.addCleanup(os.unlink, path)
+        return RuleEngine(path)
+
+    def test_first_matching_rule_wins(self):
+        engine = self.engine({"risk": [
+            risk_rule({"field": "button", "op": "==", "value": 1}, "HIGH", "panic"),
+            risk_rule({"field": "gas", "op": ">", "value": 500}, "MEDIUM", "gas"),
+            risk_rule({"field": "gas", "op": ">", "value": 100}, "LOW", "some gas"),
+        ]})
+        cols = to_columns([{"gas": 600, "button": True}, {"gas": 600}, {"gas": 200}, {"gas": 50},
+                           {"gas": "n/a"}])
+        levels, reasons = engine.evaluate(cols)
+        self.assertEqual(list(levels), ["HIGH", "MEDIUM", "LOW", "NORMAL", "NORMAL"])
+        self.assertEqual(list(reasons[:3]), ["panic", "gas", "some gas"])
+
+    def test_noise_compares_with_previous_reading(self):
+        engine = self.engine(DEFAULT_RULES)
+        mask, reasons = engine.noise(to_columns([{"temperature": 50}]), to_columns([{"temperature": 20}]))
+        self.assertEqual(list(mask), [True])
+        self.assertEqual(reasons[0], "Large temperature change detected")
+        mask, _ = engine.noise(to_columns([{"temperature": 50}]))
+        self.assertEqual(list(mask), [False])
+
+    def test_model_rules(self):
+        engine = self.engine(DEFAULT_RULES)
+        cols = to_columns([{"gas": 100}] * 3)
+        cols["prediction"] = np.array([1, 1, 0])
+        cols["proba"] = np.array([0.9, 0.5, 0.9])
+        levels, _ = engine.evaluate(cols)
+        self.assertEqual(list(levels), ["MEDIUM", "NORMAL", "NORMAL"])
+        # Without model output only the sensor rules can match
+        levels, _ = engine.evaluate(to_columns([{"gas": 100}, {"gas": 1000}]))
+        self.assertEqual(list(levels), ["NORMAL", "LOW"])
+
+    def test_invalid_reload_keeps_previous_rules(self):
+        engine = self.engine(DEFAULT_RULES)
+        with open(engine.path, "w") as f:
+            json.dump({"riskk": []}, f)
+        os.utime(engine.path, (0, 0))
+        with self.assertLogs("sensorapp.rules", "ERROR"):
+            self.assertFalse(engine.maybe_reload(force=True))
+        levels, _ = engine.evaluate(to_columns([{"button": True}]))
+        self.assertEqual(list(levels), ["HIGH"])
+
+
+class SendSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.scheduler = SendScheduler(normal_interval=10, risk_interval=1)
+
+    def test_new_keys_in_one_tick_are_due_together(self):
+        self.scheduler.update("a", "NORMAL", 0.2)
+        self.scheduler.update("b", "HIGH", 0.7)
+        self.assertEqual(self.scheduler.next_due(), 1.0)
+        self.assertEqual(self.scheduler.pop_due(0.9), [])
+        self.assertEqual(sorted(self.scheduler.pop_due(1.0)), ["a", "b"])
+
+    def test_interval_follows_risk_level(self):
+        self.scheduler.update("a", "NORMAL", 0)
+        self.assertEqual(self.scheduler.pop_due(0), ["a"])
+        self.assertEqual(self.scheduler.next_due(), 10)
+        # Escalating reschedules to one risk interval after the last send
+        self.scheduler.update("a", "HIGH", 0.5)
+        self.assertEqual(self.scheduler.next_due(), 1)
+        self.assertEqual(self.scheduler.pop_due(1), ["a"])
+        self.assertEqual(self.scheduler.next_due(), 2)
+        # Calming down waits a full normal interval from the last send
+        self.scheduler.update("a", "NORMAL", 1.5)
+        self.assertEqual(self.scheduler.next_due(), 11)
+        self.assertEqual(self.scheduler.pop_due(10), [])
+        self.assertEqual(self.scheduler.pop_due(11), ["a"])
+
+    def test_same_level_does_not_reschedule(self):
+        self.scheduler.update("a", "HIGH", 0)
+        self.scheduler.pop_due(0)
+        self.scheduler.update("a", "HIGH", 0.5)
+        self.assertEqual(self.scheduler.next_due(), 1)
+        self.assertEqual(len(self.scheduler.heap), 1)
+
+    def test_stale_entries_are_skipped(self):
+        self.scheduler.update("a", "NORMAL", 0)
+        self.scheduler.pop_due(0)
+        self.scheduler.update("a", "HIGH", 0)
+        self.scheduler.update("a", "NORMAL", 0)
+        # The superseded due times are still in the heap but never returned
+        self.assertEqual(len(self.scheduler.heap), 3)
+        self.assertEqual(self.scheduler.pop_due(9), [])
+        self.assertEqual(self.scheduler.pop_due(10), ["a"])
+
+    def test_removed_key_is_not_sent(self):
+        self.scheduler.update("a", "HIGH", 0)
+        self.scheduler.remove("a")
+        self.assertEqual(self.scheduler.pop_due(5), [])
+        self.assertIsNone(self.scheduler.next_due())
+        self.assertEqual(len(self.scheduler), 0)
+
+
+class AnalyzerDispatchTests(SimpleTestCase):
+    def setUp(self):
+        self.command = analyze_sensors_ml.Command(stdout=StringIO())
+        patcher = mock.patch.object(self.command, "send_sensor_data")
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def analyze(self, key, risk_level, now):
+        self.command.pending[key] = ({"device_id": key[1]}, risk_level, "status", now)
+        self.command.scheduler.update(key, risk_level, now)
+
+    def test_sends_with_the_key_of_each_device(self):
+        self.analyze((1, "3"), "NORMAL", 0)
+        self.analyze((1, "kitchen"), "HIGH", 0)
+        self.command.dispatch_due(0)
+        self.assertEqual(sorted(call.args[0] for call in self.send.call_args_list),
+                         [(1, "3"), (1, "kitchen")])
+
+    def test_stale_analysis_expires(self):
+        self.analyze((1, "3"), "HIGH", 0)
+        for now in range(1, analyze_sensors_ml.PENDING_TTL + 3):
+            self.command.dispatch_due(now)
+        self.assertEqual(self.send.call_count, analyze_sensors_ml.PENDING_TTL)
+        self.assertNotIn((1, "3"), self.command.pending)
+        self.assertEqual(len(self.command.scheduler), 0)
+
+    def test_api_device_id(self):
+        self.assertEqual(analyze_sensors_ml.api_device_id("3"), 3)
+        self.assertEqual(analyze_sensors_ml.api_device_id("kitchen"), "kitchen")
@@ -1,3 +1,5 @@
+import logging
+
 from rest_framework import generics
 from .serializers import SensorDataSerializer
 from rest_framework.decorators import api_view
@@ -5,6 +7,15 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import SensorData
 from django.forms.models import model_to_dict
+from django.utils.dateparse import parse_datetime
+from .downsample import lttb, minmax
+from .inference import model_store, score
+from .rules import READING_FIELDS, RuleEngine, to_columns
+from .writer import WRITER_SOCKET, WriterError, write_readings
+
+logger = logging.getLogger(__name__)
+
+rule_engine = RuleEngine()
 
 # This view allows POST to create a new sensor record
 # and GET to list existing sensor records.
@@ -17,18 +28,19 @@ class SensorDataListCreateView(generics.ListCreateAPIView):
 def save_sensor_data(request):
     try:
         data = request.data
-        sensor_record = SensorData(
-            device_id=data.get("device_id", ""),
-            controller=data.get("controller", ""),
-            temperature=data.get("temperature"),
-            humidity=data.get("humidity"),
-            cmk=data.get("cmk", []),
-            motion=data.get("motion", []),
-            button=not data.get("button", False),
-            gas=data.get("gas"),
-        )
-        sensor_record.save()
+        if hasattr(data, "dict"):
+            data = data.dict()
+        # Validate here so a bad reading is a 400 even when the writer service stores it
+        sensor_record = SensorData.from_payload(data)
+        if WRITER_SOCKET:
+            # Group-committed by the sensor_writer service
+            write_readings(data)
+        else:
+            sensor_record.save()
         return Response({"message": "Sensor data saved."}, status=status.HTTP_201_CREATED)
+    except WriterError as e:
+        # Writer service down or its commit failed; the client should retry
+        return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -46,3 +58,119 @@ def prev_sensor(request):
     if prev:
         return Response(model_to_dict(prev))
     return Response({}, status=204)
+
+
+@api_view(['POST'])
+def predict_risk(request):
+    """Score one reading (JSON object) or a batch (JSON list) with the emergency model.
+
+    Readings use the controller format of /api/save-sensor-data/: "button" is
+    the raw pin level, which is low (false) while the button is pressed.
+    """
+    data = request.data
+    single = isinstance(data, dict)
+    payloads = [data] if single else data
+    if not isinstance(payloads, list) or not all(isinstance(r, dict) for r in payloads):
+        return Response({"error": "Expected a reading object or a list of readings."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not payloads:
+        return Response([])
+    readings = []
+    for payload in payloads:
+        # A missing pin level would read as a pressed button
+        if "button" not in payload:
+            return Response({"error": "button is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            record = SensorData.from_payload(payload)
+        except ValueError as e:
+            return Response({"error": f"{e}."}, status=status.HTTP_400_BAD_REQUEST)
+        # Same values the analyzer reads back from the table
+        readings.append({field: getattr(record, field) for field in READING_FIELDS})
+
+    try:
+        model = model_store.get()
+    except FileNotFoundError:
+        return Response({"error": "Model not found. Run training script first."},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        # Corrupt or incompatible artifact; the rest of the API keeps working
+        logger.error(f"Failed to load model from {model_store.path}: {e}")
+        return Response({"error": "Model could not be loaded. Rebuild it with the training script."},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    predictions, probas = score(model, readings)
+    cols = to_columns(readings)
+    cols["prediction"] = predictions
+    cols["proba"] = probas
+    levels, reasons = rule_engine.evaluate(cols)
+
+    results = [
+        {
+            "prediction": int(prediction),
+            "probability": round(float(proba), 4),
+            "risk_level": level,
+            "risk_status": reason,
+        }
+        for prediction, proba, level, reason in zip(predictions, probas, levels, reasons)
+    ]
+    return Response(results[0] if single else results)
+
+
+SERIES_FIELDS = ("temperature", "humidity", "gas")
+SERIES_DEFAULT_POINTS = 1000
+SERIES_MAX_POINTS = 10000
+
+
+@api_view(['GET'])
+def sensor_series(request):
+    """Downsampled time series of one field of one device, for charts.
+
+    Query parameters: device_id, field, start/end (ISO 8601, optional),
+    points (target count) and method ("lttb" or "minmax").
+    Returns [epoch milliseconds, value] pairs.
+    """
+    params = request.query_params
+    device_id = params.get("device_id")
+    field = params.get("field", "temperature")
+    method = params.get("method", "lttb")
+    start = parse_datetime(params["start"]) if params.get("start") else None
+    end = parse_datetime(params["end"]) if params.get("end") else None
+    try:
+        points = min(int(params.get("points", SERIES_DEFAULT_POINTS)), SERIES_MAX_POINTS)
+    except ValueError:
+        points = 0
+
+    if not device_id or field not in SERIES_FIELDS or method not in ("lttb", "minmax") or points < 3:
+        return Response({"error": "Invalid device_id, field, method or points."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if (params.get("start") and start is None) or (params.get("end") and end is None):
+        return Response({"error": "Invalid start or end."}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = SensorData.objects.filter(device_id=device_id, **{f"{field}__isnull": False})
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lte=end)
+    # Rows are streamed from the cursor and never materialized as model instances
+    rows = (
+        (ts.timestamp() * 1000, value)
+        for ts, value in queryset.order_by("timestamp").values_list("timestamp", field).iterator(chunk_size=5000)
+    )
+
+    if method == "lttb":
+        sampled = lttb(rows, queryset.count(), points)
+    else:
+        if start is None or end is None:
+            bounds = queryset.order_by("timestamp").values_list("timestamp", flat=True)
+            first, last = bounds.first(), bounds.last()
+            if first is None:
+                return Response({"device_id": device_id, "field": field, "method": method, "points": []})
+            start, end = start or first, end or last
+        sampled = minmax(rows, start.timestamp() * 1000, end.timestamp() * 1000, points // 2)
+
+    return Response({
+        "device_id": device_id,
+        "field": field,
+        "method": method,
+        "points": [[int(x), y] for x, y in sampled],
+    })
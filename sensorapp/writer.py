@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+
+from django.db import transaction
+
+from .models import SensorData
+
+logger = logging.getLogger(__name__)
+
+# Unix socket of the sensor_writer service. Empty: producers write to the database directly.
+WRITER_SOCKET = os.getenv("SENSOR_WRITER_SOCKET", "")
+MAX_BATCH = 500  # Most readings committed in one transaction
+
+
+class WriterError(Exception):
+    pass
+
+
+class WriterUnavailable(WriterError):
+    """The writer service could not be reached, so nothing was committed"""
+
+
+class SensorWriter:
+    """Single database writer with group commit.
+
+    Producers submit readings from any thread; one committer thread takes
+    everything queued since its last commit and inserts it in a single
+    transaction. While a commit runs, new readings pile up and go into the
+    next one, so the number of transactions stays flat as producers grow.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def submit(self, data):
+        """Queue one reading; the returned Future resolves once it is committed"""
+        future = Future()
+        self.queue.put((data, future))
+        return future
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join(timeout=10)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.commit(batch)
+                    return
+                batch.append(item)
+            self.commit(batch)
+
+    def commit(self, batch):
+        records, futures = [], []
+        for data, future in batch:
+            try:
+                records.append(SensorData.from_payload(data))
+                futures.append(future)
+            except Exception as e:
+                future.set_exception(WriterError(str(e)))
+        if not records:
+            return
+        try:
+            with transaction.atomic():
+                SensorData.objects.bulk_create(records)
+        except Exception as e:
+            logger.error(f"Group commit of {len(records)} sensor readings failed, saving one by one: {e}")
+            self.commit_each(records, futures)
+            return
+        for future in futures:
+            future.set_result(None)
+
+    def commit_each(self, records, futures):
+        """Save records in one transaction with a savepoint each, so only bad readings fail"""
+        saved = []
+        try:
+            with transaction.atomic():
+                for record, future in zip(records, futures):
+                    # bulk_create may have assigned keys before it failed
+                    record.pk = None
+                    record._state.adding = True
+                    try:
+                        with transaction.atomic():
+                            record.save()
+                    except Exception as e:
+                        future.set_exception(WriterError(str(e)))
+                    else:
+                        saved.append(future)
+        except Exception as e:
+            logger.error(f"Failed to commit {len(saved)} sensor readings: {e}")
+            for future in saved:
+                future.set_exception(WriterError(str(e)))
+            return
+        for future in saved:
+            future.set_result(None)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One JSON reading, or a JSON list of readings, per line; answers "ok" once committed"""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                data = json.loads(line)
+                readings = data if isinstance(data, list) else [data]
+                futures = [self.server.writer.submit(reading) for reading in readings]
+                for future in futures:
+                    future.result()
+                reply = b"ok\n"
+            except Exception as e:
+                reply = f"error: {e}\n".encode()
+            self.wfile.write(reply)
+
+
+class WriterServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Many producers may connect at once
+
+    def __init__(self, path, writer):
+        if os.path.exists(path):
+            os.unlink(path)  # Left behind by a previous run
+        self.writer = writer
+        super().__init__(path, _Handler)
+
+
+class WriterClient:
+    """Connection to the writer service; not thread safe, use one per thread"""
+
+    def __init__(self, path=WRITER_SOCKET, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.sock = None
+        self.rfile = None
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.rfile = sock.makefile("rb")
+
+    def close(self):
+        if self.rfile:
+            self.rfile.close()
+        if self.sock:
+            self.sock.close()
+        self.sock = self.rfile = None
+
+    def write(self, readings):
+        """Send one reading or a list of readings and wait until they are committed"""
+        line = json.dumps(readings).encode() + b"\n"
+        try:
+            if self.sock is None:
+                self.connect()
+            self.sock.sendall(line)
+            reply = self.rfile.readline()
+        except OSError as e:
+            self.close()
+            raise WriterUnavailable(f"Sensor writer unavailable: {e}")
+        if not reply:
+            self.close()
+            raise WriterUnavailable("Sensor writer closed the connection")
+        if reply != b"ok\n":
+            raise WriterError(reply.decode().strip())
+
+
+_local = threading.local()
+
+
+def write_readings(readings):
+    """Commit readings through the writer service using this thread's connection"""
+    client = getattr(_local, "client", None)
+    if client is None:
+        client = _local.client = WriterClient()
+    client.write(readings)